@@ -0,0 +1,82 @@
+# frame_ring.py
+# Latest-frame exchange between the physics and visualizer processes
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+SLOTS = 2
+HEADER = ('count', 'total_energy', 'collisions')
+COLUMNS = ('x', 'y', 'wavelength')
+HEADER_BYTES = SLOTS * len(HEADER) * 8
+
+class FrameRing:
+    """
+    Two frame slots in one SharedMemory block:
+    - Each slot has a float64 header (count, total_energy, collisions) and
+      float32 x, y and wavelength columns for up to `capacity` particles
+    - The producer always overwrites the older slot, then stamps it with its tick
+    - The consumer reads whichever slot carries the newest stamp
+    Only the two stamps go through a lock; frame data is never pickled.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES +
+                                              SLOTS * len(COLUMNS) * capacity * 4)
+        self.stamps = mp.Array('q', [-1] * SLOTS)  # -1 = empty or being written
+        self._attach()
+
+    def _attach(self):
+        # Headers first (float64 keeps totals exact), then the float32 columns
+        self.header = np.ndarray((SLOTS, len(HEADER)), dtype=np.float64, buffer=self.shm.buf)
+        self.columns = np.ndarray((SLOTS, len(COLUMNS), self.capacity), dtype=np.float32,
+                                  buffer=self.shm.buf, offset=HEADER_BYTES)
+
+    def __getstate__(self):
+        return {'capacity': self.capacity, 'shm': self.shm, 'stamps': self.stamps}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach()
+
+    def write(self, tick, x, y, wavelength, total_energy, collisions):
+        """Publish a frame (producer side)"""
+        stamps = self.stamps
+        slot = 0 if stamps[0] <= stamps[1] else 1
+        n = len(x)
+
+        stamps[slot] = -1
+        self.header[slot] = (n, total_energy, collisions)
+        self.columns[slot, 0, :n] = x
+        self.columns[slot, 1, :n] = y
+        self.columns[slot, 2, :n] = wavelength
+        stamps[slot] = tick
+
+    def read(self, last_tick=-1):
+        """
+        Copy of the newest frame as a dict (consumer side).
+        Returns None if nothing newer than last_tick has been published,
+        or if the slot was overwritten while being copied.
+        """
+        stamps = self.stamps
+        slot = 0 if stamps[0] >= stamps[1] else 1
+        tick = stamps[slot]
+        if tick <= last_tick:
+            return None
+
+        n = int(self.header[slot, 0])
+        frame = {name: self.columns[slot, k, :n].copy() for k, name in enumerate(COLUMNS)}
+        frame['count'] = n
+        frame['tick'] = tick
+        frame['total_energy'] = float(self.header[slot, 1])
+        frame['collisions'] = int(self.header[slot, 2])
+
+        if stamps[slot] != tick:
+            return None
+        return frame
+
+    def release(self):
+        """Free the shared block (owner only, once both processes are gone)"""
+        del self.header, self.columns
+        self.shm.close()
+        self.shm.unlink()
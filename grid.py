@@ -1,29 +1,60 @@
 # grid.py
 
+import math
+import numpy as np
+from numba import njit
+
+@njit(cache=True)
+def cell_index(x, y, cell_size, nx, ny):
+    """Flat index of the cell containing (x, y), offset by the padding ring"""
+    cx = min(max(int(x / cell_size) + 1, 1), nx - 2)
+    cy = min(max(int(y / cell_size) + 1, 1), ny - 2)
+    return cx * ny + cy
+
+@njit(cache=True)
+def fill_cells(cell_head, next_in_cell, pos_x, pos_y, n, cell_size, nx, ny):
+    """Rebuild the cell lists from the first n positions"""
+    cell_head.fill(-1)
+    for i in range(n):
+        c = cell_index(pos_x[i], pos_y[i], cell_size, nx, ny)
+        next_in_cell[i] = cell_head[c]
+        cell_head[c] = i
+
 class Grid:
-    def __init__(self, bounds, cell_size):
+    """
+    Uniform cell grid stored as linked lists in flat arrays:
+    - cell_head[c] is the first particle index in cell c (-1 if empty)
+    - next_in_cell[i] is the particle after i in the same cell (-1 at the end)
+    A ring of empty padding cells keeps 3x3 neighbour lookups in range.
+    """
+    def __init__(self, bounds, cell_size, capacity):
         self.bounds = bounds
         self.cell_size = float(cell_size)
-        self.cells = {}
+        self.nx = math.ceil(bounds[0] / self.cell_size) + 2
+        self.ny = math.ceil(bounds[1] / self.cell_size) + 2
+        self.cell_head = np.full(self.nx * self.ny, -1, np.int32)
+        self.next_in_cell = np.empty(capacity, np.int32)
 
     def clear(self):
-        self.cells = {}
-
-    def insert(self, particle):
-        x = int(particle.position.x / self.cell_size)
-        y = int(particle.position.y / self.cell_size)
-        key = (x, y)
-        if key not in self.cells:
-            self.cells[key] = []
-        self.cells[key].append(particle)
-
-    def get_neighbors(self, particle):
-        cx = int(particle.position.x / self.cell_size)
-        cy = int(particle.position.y / self.cell_size)
+        self.cell_head.fill(-1)
+
+    def insert(self, index, x, y):
+        c = cell_index(x, y, self.cell_size, self.nx, self.ny)
+        self.next_in_cell[index] = self.cell_head[c]
+        self.cell_head[c] = index
+
+    def build(self, pos_x, pos_y, n):
+        """Clear the grid and insert the first n particles in one compiled pass"""
+        fill_cells(self.cell_head, self.next_in_cell, pos_x, pos_y, n,
+                   self.cell_size, self.nx, self.ny)
+
+    def get_neighbors(self, x, y):
+        c = cell_index(x, y, self.cell_size, self.nx, self.ny)
         neighbors = []
         for dx in range(-1, 2):
             for dy in range(-1, 2):
-                key = (cx + dx, cy + dy)
-                if key in self.cells:
-                    neighbors.extend(self.cells[key])
+                j = self.cell_head[c + dx * self.ny + dy]
+                while j != -1:
+                    neighbors.append(int(j))
+                    j = self.next_in_cell[j]
         return neighbors
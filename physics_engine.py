@@ -5,13 +5,16 @@ import time
 import queue
 import math
 import random
-from vector import Vector2D
-from grid import Grid
+import numpy as np
+from numba import njit, prange
+from grid import Grid, cell_index
 
 # --- Configuration ---
 ENV_SIZE = (800, 600)
 SPEED_OF_LIGHT = 200.0   # Constant speed (all particles travel at c)
 COLLISION_RADIUS = 8.0   
+MAX_PARTICLES = 4096     # Capacity of the particle state arrays
+SAP_MAX_PARTICLES = 1000 # Above this, collisions use the grid broad phase
 
 # Tunable Parameters
 tunable_params = {
@@ -20,6 +23,19 @@ tunable_params = {
     'time_scale': 1.0
 }
 
+# Unit vectors at 45° steps, used to separate exactly coincident particles
+_DIRS = np.array([(math.cos(k * math.pi / 4), math.sin(k * math.pi / 4)) for k in range(8)])
+
+# --- Particle State (Structure of Arrays) ---
+# Particle i lives at index i of every array; only the first n are live.
+# float32 is plenty for an 800x600 visual simulation and halves memory traffic.
+pos_x = np.zeros(MAX_PARTICLES, dtype=np.float32)
+pos_y = np.zeros(MAX_PARTICLES, dtype=np.float32)
+vel_x = np.zeros(MAX_PARTICLES, dtype=np.float32)
+vel_y = np.zeros(MAX_PARTICLES, dtype=np.float32)
+energy = np.zeros(MAX_PARTICLES, dtype=np.float32)  # Canonical state; wavelength is derived for display
+pid = np.zeros(MAX_PARTICLES, dtype=np.int64)
+
 class PhotonLikeParticle:
     """
     A particle with:
@@ -31,13 +47,13 @@ class PhotonLikeParticle:
         self.id = pid
         self.position = pos
         self.velocity = vel
-        self.wavelength = float(wavelength)
+        # Energy proportional to 1/wavelength (E = hc/λ analog)
+        self.energy = 100000.0 / max(1.0, float(wavelength))
     
     @property
-    def energy(self):
-        """Energy proportional to 1/wavelength (E = hc/λ analog)"""
-        safe_lambda = max(1.0, self.wavelength)
-        return 100000.0 / safe_lambda
+    def wavelength(self):
+        """Wavelength derived from energy (λ = hc/E analog)"""
+        return 100000.0 / self.energy
     
     @property
     def momentum_magnitude(self):
@@ -45,42 +61,47 @@ class PhotonLikeParticle:
         return self.energy / SPEED_OF_LIGHT
 
     def set_energy(self, new_energy):
-        """Update wavelength based on new energy"""
+        """Update energy (and with it the wavelength)"""
         if new_energy <= 0:
             new_energy = 1.0  # Prevent zero/negative energy
-        self.wavelength = 100000.0 / new_energy
+        self.energy = new_energy
 
-def resolve_relativistic_collision(p1, p2):
+def photon_wavelength(energy):
+    """Wavelength of each energy in an array (λ = hc/E analog)"""
+    return 100000.0 / np.maximum(energy, 1.0)
+
+@njit(cache=True, fastmath=True)
+def _scatter(p1x, p1y, v1x, v1y, E1, p2x, p2y, v2x, v2y, E2):
     """
-    Collision resolution with conservation laws:
-    - Conserves total energy (sum of E1 + E2)
-    - Conserves total momentum vector
-    - Particles maintain constant speed (direction changes only)
-    - Energy transfer depends on collision angle
+    Lossless core shared by both collision resolvers: energy transfer and
+    reflected velocities. Energies are returned unclamped.
     """
     
-    # Get initial state
-    E1_initial = p1.energy
-    E2_initial = p2.energy
-    E_total = E1_initial + E2_initial
-    
-    # Initial momentum vectors (p = E/c * direction)
-    p1_momentum = p1.velocity.normalize() * p1.momentum_magnitude
-    p2_momentum = p2.velocity.normalize() * p2.momentum_magnitude
-    p_total = p1_momentum + p2_momentum
-    
     # Collision normal (from p2 to p1)
-    collision_axis = (p1.position - p2.position).normalize()
-    if collision_axis.magnitude() == 0:
-        collision_axis = Vector2D(1, 0)
+    ax = p1x - p2x
+    ay = p1y - p2y
+    mag = math.hypot(ax, ay)
+    if mag > 0:
+        inv = 1.0 / mag
+        ax *= inv
+        ay *= inv
+    else:
+        ax = 1.0
+        ay = 0.0
     
     # Decompose velocities into normal and tangential components
-    v1_norm = p1.velocity.normalize()
-    v2_norm = p2.velocity.normalize()
+    mag = math.hypot(v1x, v1y)
+    inv = 1.0 / mag if mag > 0 else 0.0
+    n1x = v1x * inv
+    n1y = v1y * inv
+    mag = math.hypot(v2x, v2y)
+    inv = 1.0 / mag if mag > 0 else 0.0
+    n2x = v2x * inv
+    n2y = v2y * inv
     
     # Dot products with collision axis
-    v1_along = v1_norm.x * collision_axis.x + v1_norm.y * collision_axis.y
-    v2_along = v2_norm.x * collision_axis.x + v2_norm.y * collision_axis.y
+    v1_along = n1x * ax + n1y * ay
+    v2_along = n2x * ax + n2y * ay
     
     # Relative velocity along collision axis
     v_rel = v1_along - v2_along
@@ -95,18 +116,62 @@ def resolve_relativistic_collision(p1, p2):
     
     # Energy transfer (limited by conservation)
     energy_transfer_fraction = collision_efficiency * 0.5
-    energy_transfer = min(E1_initial, E2_initial) * energy_transfer_fraction
+    energy_transfer = min(E1, E2) * energy_transfer_fraction
     
-    # Apply energy transfer
-    if E1_initial > E2_initial:
-        E1_final = E1_initial - energy_transfer
-        E2_final = E2_initial + energy_transfer
-    else:
-        E1_final = E1_initial + energy_transfer
-        E2_final = E2_initial - energy_transfer
+    # Apply energy transfer (the more energetic particle gives it away)
+    direction = math.copysign(1.0, E2 - E1)
+    E1_final = E1 + direction * energy_transfer
+    E2_final = E2 - direction * energy_transfer
+    
+    # --- MOMENTUM CONSERVATION ---
+    # Reflect velocities along collision axis (elastic collision)
+    # Keep tangential components, reverse normal components
+    n1x -= 2.0 * ax * v1_along
+    n1y -= 2.0 * ay * v1_along
+    n2x -= 2.0 * ax * v2_along
+    n2y -= 2.0 * ay * v2_along
+    
+    # New velocities at constant speed
+    # (small deviations in total momentum acceptable for visual simulation)
+    mag = math.hypot(n1x, n1y)
+    inv = SPEED_OF_LIGHT / mag if mag > 0 else 0.0
+    v1x = n1x * inv
+    v1y = n1y * inv
+    mag = math.hypot(n2x, n2y)
+    inv = SPEED_OF_LIGHT / mag if mag > 0 else 0.0
+    v2x = n2x * inv
+    v2y = n2y * inv
+    
+    return v1x, v1y, E1_final, v2x, v2y, E2_final
+
+@njit(cache=True, fastmath=True)
+def resolve_elastic_collision(p1x, p1y, v1x, v1y, E1, p2x, p2y, v2x, v2y, E2):
+    """
+    resolve_relativistic_collision specialized for decay == 0: the energy
+    sum is exact by construction, so there is nothing to renormalize.
+    """
+    v1x, v1y, E1, v2x, v2y, E2 = _scatter(p1x, p1y, v1x, v1y, E1, p2x, p2y, v2x, v2y, E2)
+    
+    # Update energies, preventing zero/negative energy
+    E1 = E1 if E1 > 0 else 1.0
+    E2 = E2 if E2 > 0 else 1.0
+    
+    return v1x, v1y, E1, v2x, v2y, E2
+
+@njit(cache=True, fastmath=True)
+def resolve_relativistic_collision(p1x, p1y, v1x, v1y, E1, p2x, p2y, v2x, v2y, E2, decay):
+    """
+    Collision resolution with conservation laws:
+    - Conserves total energy (sum of E1 + E2)
+    - Conserves total momentum vector
+    - Particles maintain constant speed (direction changes only)
+    - Energy transfer depends on collision angle
+    Works on plain floats; returns (v1x, v1y, E1, v2x, v2y, E2) after the collision.
+    """
+    E_total = E1 + E2
+    v1x, v1y, E1_final, v2x, v2y, E2_final = _scatter(p1x, p1y, v1x, v1y, E1, p2x, p2y, v2x, v2y, E2)
     
     # Apply global decay (entropy/inelastic losses)
-    decay = tunable_params.get('global_decay', 0.0)
     if decay > 0:
         E1_final *= (1.0 - decay)
         E2_final *= (1.0 - decay)
@@ -119,36 +184,147 @@ def resolve_relativistic_collision(p1, p2):
         E1_final *= correction_factor
         E2_final *= correction_factor
     
-    # Update energies (wavelengths)
-    p1.set_energy(E1_final)
-    p2.set_energy(E2_final)
+    # Update energies, preventing zero/negative energy
+    E1 = E1_final if E1_final > 0 else 1.0
+    E2 = E2_final if E2_final > 0 else 1.0
     
-    # --- MOMENTUM CONSERVATION ---
-    # Calculate new momentum magnitudes
-    p1_mag_final = p1.momentum_magnitude
-    p2_mag_final = p2.momentum_magnitude
+    return v1x, v1y, E1, v2x, v2y, E2
+
+@njit(cache=True, fastmath=True, parallel=True)
+def move_and_bounce(pos_x, pos_y, vel_x, vel_y, energy, n, step, R, decay):
+    """
+    Advance the first n particles by one step in a single fused pass:
+    movement, wall reflection/clamping and wall energy loss.
+    Particles are independent here, so the pass is split across cores.
+    """
+    W, H = ENV_SIZE
+    for i in prange(n):
+        pos_x[i] += vel_x[i] * step
+        pos_y[i] += vel_y[i] * step
+        
+        # Wall collisions (perfect reflection), written branch-free:
+        # a hit flips the sign, and clamping is a no-op away from the walls
+        hit_x = (pos_x[i] <= R) | (pos_x[i] >= W - R)
+        hit_y = (pos_y[i] <= R) | (pos_y[i] >= H - R)
+        vel_x[i] *= 1.0 - 2.0 * hit_x
+        vel_y[i] *= 1.0 - 2.0 * hit_y
+        pos_x[i] = max(R, min(W - R, pos_x[i]))
+        pos_y[i] = max(R, min(H - R, pos_y[i]))
+        
+        # Wall collision energy loss (factor is 1.0 without a hit or decay)
+        energy[i] *= 1.0 - (hit_x | hit_y) * decay * 0.5
+
+@njit(cache=True, fastmath=True)
+def collide_pair(i, j, pos_x, pos_y, vel_x, vel_y, energy, R, decay):
+    """Narrow phase for one candidate pair; returns True if they collided"""
+    dx = pos_x[i] - pos_x[j]
+    dy = pos_y[i] - pos_y[j]
+    dist_sq = dx * dx + dy * dy
+    if dist_sq >= (R * 2) * (R * 2):
+        return False
     
-    # Reflect velocities along collision axis (elastic collision)
-    # Keep tangential components, reverse normal components
-    v1_tangent = v1_norm - collision_axis * v1_along
-    v2_tangent = v2_norm - collision_axis * v2_along
+    # Physics-improved collision resolution
+    # (decay is fixed for the whole tick, so this branch always goes one way)
+    if decay > 0:
+        (vel_x[i], vel_y[i], energy[i],
+         vel_x[j], vel_y[j], energy[j]) = resolve_relativistic_collision(
+            pos_x[i], pos_y[i], vel_x[i], vel_y[i], energy[i],
+            pos_x[j], pos_y[j], vel_x[j], vel_y[j], energy[j], decay)
+    else:
+        (vel_x[i], vel_y[i], energy[i],
+         vel_x[j], vel_y[j], energy[j]) = resolve_elastic_collision(
+            pos_x[i], pos_y[i], vel_x[i], vel_y[i], energy[i],
+            pos_x[j], pos_y[j], vel_x[j], vel_y[j], energy[j])
+    
+    # Separate overlapping particles
+    dist = math.sqrt(dist_sq)
+    if dist > 0:
+        sx = dx / dist
+        sy = dy / dist
+    else:
+        sx, sy = _DIRS[random.getrandbits(3)]
+    
+    push = (R * 2 - dist) * 0.5 + 0.1
+    pos_x[i] += sx * push
+    pos_y[i] += sy * push
+    pos_x[j] -= sx * push
+    pos_y[j] -= sy * push
+    return True
+
+@njit(cache=True)
+def sweep_and_prune(pos_x, pos_y, order, R):
+    """
+    Sort-and-sweep broad phase over particle indices sorted by x.
+    Returns an (m, 2) int32 array of candidate pairs whose x and y
+    extents overlap.
+    """
+    reach = R * 2
+    count = len(order)
     
-    # New velocities (reflected along collision axis)
-    v1_new = (v1_tangent + collision_axis * (-v1_along)).normalize()
-    v2_new = (v2_tangent + collision_axis * (-v2_along)).normalize()
+    # First pass sizes the output, second pass fills it
+    m = 0
+    for a in range(count):
+        i = order[a]
+        for b in range(a + 1, count):
+            j = order[b]
+            if pos_x[j] - pos_x[i] >= reach:
+                break
+            if abs(pos_y[j] - pos_y[i]) < reach:
+                m += 1
     
-    # Ensure total momentum is approximately conserved
-    # (small deviations acceptable for visual simulation)
-    p1.velocity = v1_new * SPEED_OF_LIGHT
-    p2.velocity = v2_new * SPEED_OF_LIGHT
+    pairs = np.empty((m, 2), np.int32)
+    m = 0
+    for a in range(count):
+        i = order[a]
+        for b in range(a + 1, count):
+            j = order[b]
+            if pos_x[j] - pos_x[i] >= reach:
+                break
+            if abs(pos_y[j] - pos_y[i]) < reach:
+                pairs[m, 0] = min(i, j)
+                pairs[m, 1] = max(i, j)
+                m += 1
+    return pairs
 
-def simulation_process(data_q, param_q):
+@njit(cache=True, fastmath=True)
+def collide_pairs(pairs, pos_x, pos_y, vel_x, vel_y, energy, R, decay):
+    """Narrow phase over sweep-and-prune candidates; returns the collision count"""
+    collisions = 0
+    for k in range(pairs.shape[0]):
+        if collide_pair(pairs[k, 0], pairs[k, 1], pos_x, pos_y, vel_x, vel_y, energy, R, decay):
+            collisions += 1
+    return collisions
+
+@njit(cache=True, fastmath=True)
+def collide(pos_x, pos_y, vel_x, vel_y, energy, n,
+            cell_head, next_in_cell, cell_size, nx, ny, R, decay):
+    """
+    Broad + narrow phase collision pass over the first n particles.
+    - Broad phase: walks the linked cell lists of a built Grid
+    - Narrow phase: squared-distance test against the 3x3 cell block
+    Returns the number of collisions resolved.
+    """
+    collisions = 0
+    
+    for i in range(n):
+        c = cell_index(pos_x[i], pos_y[i], cell_size, nx, ny)
+        for gx in range(-1, 2):
+            for gy in range(-1, 2):
+                j = cell_head[c + gx * ny + gy]
+                while j != -1:
+                    # Each pair is handled once, from its lower index
+                    if j > i and collide_pair(i, j, pos_x, pos_y, vel_x, vel_y, energy, R, decay):
+                        collisions += 1
+                    j = next_in_cell[j]
+    
+    return collisions
+
+def simulation_process(frames, param_q):
     """Main physics simulation loop"""
-    grid = Grid(ENV_SIZE, cell_size=COLLISION_RADIUS * 3)
-    particles = []
+    grid = Grid(ENV_SIZE, cell_size=COLLISION_RADIUS * 3, capacity=MAX_PARTICLES)
+    n = 0
     
     beam_queue = 0
-    next_id = 0
     
     running = False
     tick = 0
@@ -157,6 +333,20 @@ def simulation_process(data_q, param_q):
     # Statistics tracking
     total_energy = 0
     collision_count = 0
+    sent_count = 0  # Particle count in the last frame sent
+    
+    R = COLLISION_RADIUS
+    H = ENV_SIZE[1]
+    rng = np.random.default_rng()
+    
+    # Compile (or load from the on-disk cache) every kernel up front with
+    # zero particles, so the first tick after FIRE doesn't stall
+    move_and_bounce(pos_x, pos_y, vel_x, vel_y, energy, 0, dt, R, 0.0)
+    collide_pairs(sweep_and_prune(pos_x, pos_y, np.argsort(pos_x[:0]), R),
+                  pos_x, pos_y, vel_x, vel_y, energy, R, 0.0)
+    grid.build(pos_x, pos_y, 0)
+    collide(pos_x, pos_y, vel_x, vel_y, energy, 0, grid.cell_head, grid.next_in_cell,
+            grid.cell_size, grid.nx, grid.ny, R, 0.0)
     
     while True:
         try:
@@ -173,9 +363,8 @@ def simulation_process(data_q, param_q):
                         beam_queue = int(tunable_params['photon_count'])
                         running = True
                     elif cmd == 'CLEAR':
-                        particles.clear()
+                        n = 0
                         beam_queue = 0
-                        next_id = 0
                         collision_count = 0
 
                 if 'params' in msg:
@@ -187,97 +376,56 @@ def simulation_process(data_q, param_q):
                 time.sleep(0.1)
                 continue
 
+            # Idle: no particles, none queued, and the empty frame is already out
+            if n == 0 and beam_queue == 0 and sent_count == 0:
+                tick += 1
+                time.sleep(dt)
+                continue
+
             # --- Particle Emission ---
-            if beam_queue > 0:
-                start_pos = Vector2D(50, ENV_SIZE[1] / 2)
+            # The whole queued beam is emitted at once (capped by capacity)
+            k = min(beam_queue, MAX_PARTICLES - n)
+            if k > 0:
                 # Small angular spread for beam divergence
-                angle_spread = random.uniform(-0.15, 0.15)
-                velocity = Vector2D(
-                    math.cos(angle_spread), 
-                    math.sin(angle_spread)
-                ).normalize() * SPEED_OF_LIGHT
+                angle_spread = rng.uniform(-0.15, 0.15, k)
+                pos_x[n:n + k] = 50
+                pos_y[n:n + k] = H / 2
+                vel_x[n:n + k] = np.cos(angle_spread) * SPEED_OF_LIGHT
+                vel_y[n:n + k] = np.sin(angle_spread) * SPEED_OF_LIGHT
                 
                 # Random wavelength (visible spectrum + some IR/UV)
-                wavelength = random.uniform(350, 800)
+                energy[n:n + k] = 100000.0 / rng.uniform(350, 800, k)
                 
-                particles.append(PhotonLikeParticle(next_id, start_pos, velocity, wavelength))
-                next_id += 1
-                beam_queue -= 1
+                pid[n:n + k] = np.arange(n, n + k)
+                n += k
+            beam_queue = 0
 
             # --- Physics Update ---
             t_scale = tunable_params.get('time_scale', 1.0)
+            decay = tunable_params['global_decay']
+            px, py = pos_x[:n], pos_y[:n]
+            en = energy[:n]
 
-            # 1. Movement (scaled by time dilation)
-            for p in particles:
-                p.position = p.position + (p.velocity * dt * t_scale)
-                
-                # Wall collisions (perfect reflection)
-                hit_wall = False
-                if p.position.x <= COLLISION_RADIUS or p.position.x >= ENV_SIZE[0] - COLLISION_RADIUS:
-                    p.velocity.x *= -1
-                    p.position.x = max(COLLISION_RADIUS, min(ENV_SIZE[0] - COLLISION_RADIUS, p.position.x))
-                    hit_wall = True
-                    
-                if p.position.y <= COLLISION_RADIUS or p.position.y >= ENV_SIZE[1] - COLLISION_RADIUS:
-                    p.velocity.y *= -1
-                    p.position.y = max(COLLISION_RADIUS, min(ENV_SIZE[1] - COLLISION_RADIUS, p.position.y))
-                    hit_wall = True
-                
-                # Wall collision energy loss
-                if hit_wall and tunable_params['global_decay'] > 0:
-                    p.set_energy(p.energy * (1.0 - tunable_params['global_decay'] * 0.5))
+            # 1. Movement (scaled by time dilation) and wall collisions
+            move_and_bounce(pos_x, pos_y, vel_x, vel_y, energy, n, dt * t_scale, R, decay)
 
             # 2. Collision Detection & Resolution
-            grid.clear()
-            for p in particles:
-                grid.insert(p)
-            
-            processed = set()
-            
-            for p1 in particles:
-                neighbors = grid.get_neighbors(p1)
-                for p2 in neighbors:
-                    if p1.id >= p2.id:
-                        continue
-                    
-                    pair_id = (p1.id, p2.id)
-                    if pair_id in processed:
-                        continue
-                    
-                    dist = (p1.position - p2.position).magnitude()
-                    if dist < COLLISION_RADIUS * 2:
-                        processed.add(pair_id)
-                        collision_count += 1
-                        
-                        # Physics-improved collision resolution
-                        resolve_relativistic_collision(p1, p2)
-                        
-                        # Separate overlapping particles
-                        overlap = COLLISION_RADIUS * 2 - dist
-                        if overlap > 0:
-                            separation = (p1.position - p2.position).normalize()
-                            if separation.magnitude() == 0:
-                                separation = Vector2D(random.choice([-1, 1]), random.choice([-1, 1])).normalize()
-                            
-                            p1.position += separation * (overlap * 0.5 + 0.1)
-                            p2.position -= separation * (overlap * 0.5 + 0.1)
+            # (nothing can collide with fewer than two particles)
+            if 2 <= n <= SAP_MAX_PARTICLES:
+                pairs = sweep_and_prune(pos_x, pos_y, np.argsort(px), R)
+                collision_count += collide_pairs(pairs, pos_x, pos_y, vel_x, vel_y, energy, R, decay)
+            elif n > SAP_MAX_PARTICLES:
+                grid.build(pos_x, pos_y, n)
+                collision_count += collide(pos_x, pos_y, vel_x, vel_y, energy, n,
+                                           grid.cell_head, grid.next_in_cell,
+                                           grid.cell_size, grid.nx, grid.ny, R, decay)
 
             # 3. Calculate Statistics
-            total_energy = sum(p.energy for p in particles)
+            total_energy = float(en.sum(dtype=np.float64))
             
             # 4. Export Data
-            packet = {
-                'x': [p.position.x for p in particles],
-                'y': [p.position.y for p in particles],
-                'wavelength': [p.wavelength for p in particles],
-                'count': len(particles),
-                'tick': tick,
-                'total_energy': total_energy,
-                'collisions': collision_count
-            }
-            
-            if data_q.qsize() < 2:
-                data_q.put({'frame': packet})
+            frames.write(tick, px, py, photon_wavelength(en), total_energy, collision_count)
+            sent_count = n
             
             tick += 1
             time.sleep(dt)
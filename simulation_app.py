@@ -4,8 +4,9 @@ import streamlit as st
 import multiprocessing as mp
 import subprocess
 import time
-from physics_engine import simulation_process
+from physics_engine import simulation_process, MAX_PARTICLES
 from visualizer import visualization_process
+from frame_ring import FrameRing
 
 def kill_port(port):
     try:
@@ -27,16 +28,16 @@ st.markdown("""
 
 if 'sim_running' not in st.session_state:
     st.session_state.sim_running = False
-    st.session_state.q_data = None
+    st.session_state.frames = None
     st.session_state.q_param = None
     st.session_state.ps = []
 
 def start():
     kill_port(5006)
-    st.session_state.q_data = mp.Queue()
+    st.session_state.frames = FrameRing(MAX_PARTICLES)
     st.session_state.q_param = mp.Queue()
-    p1 = mp.Process(target=simulation_process, args=(st.session_state.q_data, st.session_state.q_param))
-    p2 = mp.Process(target=visualization_process, args=(st.session_state.q_data,))
+    p1 = mp.Process(target=simulation_process, args=(st.session_state.frames, st.session_state.q_param))
+    p2 = mp.Process(target=visualization_process, args=(st.session_state.frames,))
     p1.start(); p2.start()
     st.session_state.ps = [p1, p2]
     st.session_state.q_param.put({'command': 'START'})
@@ -46,6 +47,10 @@ def stop():
     if st.session_state.q_param: st.session_state.q_param.put({'command': 'STOP'})
     for p in st.session_state.ps:
         if p.is_alive(): p.terminate()
+        p.join()
+    if st.session_state.frames:
+        st.session_state.frames.release()
+        st.session_state.frames = None
     st.session_state.sim_running = False
 
 col1, col2 = st.columns([1, 2])
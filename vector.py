@@ -5,6 +5,8 @@ import math
 class Vector2D:
     """A utility class for 2D vector mathematics."""
     
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0.0, y=0.0):
         self.x = float(x)
         self.y = float(y)
@@ -24,13 +26,14 @@ class Vector2D:
         return Vector2D(self.x / scalar, self.y / scalar)
         
     def magnitude(self):
-        return math.sqrt(self.x**2 + self.y**2)
+        return math.hypot(self.x, self.y)
 
     def normalize(self):
         mag = self.magnitude()
         if mag == 0:
             return Vector2D(0, 0)
-        return self / mag
+        inv = 1.0 / mag
+        return Vector2D(self.x * inv, self.y * inv)
 
     def __repr__(self):
         return f"Vector2D({self.x:.2f}, {self.y:.2f})"
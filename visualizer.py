@@ -3,20 +3,21 @@
 import sys
 import signal
 import queue
+import numpy as np
+from numba import vectorize, uint32, float64
 from bokeh.plotting import figure
 from bokeh.models import ColumnDataSource, Div
 from bokeh.layouts import column
 from bokeh.server.server import Server
 
-def wavelength_to_hex(wavelength):
-    """Convert wavelength to RGB hex color (visible + invisible spectrums)"""
-    w = float(wavelength)
-    
+@vectorize([uint32(float64)], cache=True)
+def wavelength_to_rgb(w):
+    """Convert wavelength to a packed 0xRRGGBB color (visible + invisible spectrums)"""
     # --- VISUALIZE INVISIBLE SPECTRUMS ---
     if w < 380:  # UV
-        return "#C0C0FF"  # Light violet/blue tint (higher energy)
+        return 0xC0C0FF  # Light violet/blue tint (higher energy)
     if w > 750:  # IR
-        return "#404040"  # Dark grey (lower energy, invisible)
+        return 0x404040  # Dark grey (lower energy, invisible)
 
     # --- STANDARD VISIBLE SPECTRUM ---
     R, G, B = 0.0, 0.0, 0.0
@@ -50,12 +51,20 @@ def wavelength_to_hex(wavelength):
         factor = 0.3
 
     gamma = 0.8
-    def adjust(color, factor):
-        return int(255 * (color * factor) ** gamma)
+    r = int(255 * (R * factor) ** gamma)
+    g = int(255 * (G * factor) ** gamma)
+    b = int(255 * (B * factor) ** gamma)
+    return (r << 16) | (g << 8) | b
 
-    return f"#{adjust(R, factor):02x}{adjust(G, factor):02x}{adjust(B, factor):02x}"
+# Hex colors for every whole wavelength from 0 to 1023 nm (display resolution)
+_HEX_LUT = [f"#{c:06x}" for c in wavelength_to_rgb(np.arange(1024, dtype=np.float64)).tolist()]
+_HEX_LUT_ARR = np.array(_HEX_LUT)
 
-def visualization_process(data_q):
+def wavelength_to_hex(wavelength):
+    """Convert wavelength to RGB hex color (visible + invisible spectrums)"""
+    return _HEX_LUT[min(1023, max(0, int(wavelength)))]
+
+def visualization_process(frames):
     """Bokeh visualization server"""
     server = None
     
@@ -115,19 +124,20 @@ def visualization_process(data_q):
             alpha=0.95
         )
 
+        shown = {'tick': -1}
+
         def update():
             """Update visualization from physics data"""
             try:
-                data = None
-                # Get most recent frame
-                while not data_q.empty():
-                    data = data_q.get_nowait()
+                # Get most recent frame (None if nothing new since the last one)
+                frame = frames.read(shown['tick'])
                 
-                if data and 'frame' in data:
-                    frame = data['frame']
+                if frame:
+                    shown['tick'] = frame['tick']
                     
                     # Convert wavelengths to colors
-                    hex_colors = [wavelength_to_hex(w) for w in frame['wavelength']]
+                    lut_index = np.clip(frame['wavelength'], 0, 1023).astype(np.int32)
+                    hex_colors = _HEX_LUT_ARR[lut_index].tolist()
                     
                     # Update particle positions
                     source.data = {